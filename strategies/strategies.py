@@ -14,19 +14,20 @@ class GOOGLStrategy(strategy_base):
         self.bet_date = datetime.datetime.now()
         self.promises = [] # list[promise_base]
 
-    def make_choice(self) -> list[dict[str, tuple[buy_or_sell_choice, float]]]:
-        today_price = extract_close_price(self.latest_stocks_info["GOOGL"], self.today_time)
-        if today_price == None:
+    def make_choice(self) -> list[stock_choice]:
+        googl_info = self.latest_stocks_info["GOOGL"]
+        today_price = extract_close_price(googl_info, self.today_time)
+        if today_price is None:
             return []
         choices = []
-        GOOGL_history_price = self.latest_stocks_info["GOOGL"].get_history_price(self.today_time)
-        x = GOOGL_history_price.loc[GOOGL_history_price.index.get_level_values("date") > (self.today_time - datetime.timedelta(days=90)).date()].close.values
+        x = googl_info.get_history_close_prices(self.today_time, datetime.timedelta(days=90))
         if len(x) < 2:
             return choices
         hurst_exponent, c = math_util.rs_analysis(x, 2)
-        mean = np.average(list(x))
+        mean = x.mean()
         if hurst_exponent > 0.9 and hurst_exponent < 0.95:
-            trending_rate = (list(x)[-1] - list(x)[0]) / list(x)[0]
+            first, last = x[0], x[-1]
+            trending_rate = (last - first) / first
             if trending_rate > 0.1 and not self.has_bet:
                 # print(trending_rate, self.today_time)
                 # self.has_bet = True
@@ -34,25 +35,24 @@ class GOOGLStrategy(strategy_base):
                 self.bet_target_price = x[-1] * trending_rate
                 self.bet_date = self.today_time
                 number = np.clip(10000 - self.hold_stock_number["GOOGL"] * 0.5, 0, 10000)
-                choices.append({"GOOGL": (buy_or_sell_choice.Buy, number)})
+                choices.append(stock_choice("GOOGL", buy_or_sell_choice.Buy, number))
                 if self.initial_money + self.changed_money > 0:
-                    self.new_promise(promise_sell(mean * 1.1, self.today_time + datetime.timedelta(days=16), self.latest_stocks_info["GOOGL"], "GOOGL", number))
-                # choice = {"GOOGL": (buy_or_sell_choice.Buy, (self.initial_money + self.changed_money) / x[-1])}
+                    self.new_promise(promise_sell(mean * 1.1, self.today_time + datetime.timedelta(days=16), googl_info, "GOOGL", number))
+                # choice = stock_choice("GOOGL", buy_or_sell_choice.Buy, (self.initial_money + self.changed_money) / x[-1])
         elif hurst_exponent < 0.4:
             if today_price < mean * 0.9:
-                choices.append({"GOOGL": (buy_or_sell_choice.Buy, 1000)})
-                self.new_promise(promise_sell(mean, self.today_time + datetime.timedelta(days=30), self.latest_stocks_info["GOOGL"], "GOOGL", 1000))
+                choices.append(stock_choice("GOOGL", buy_or_sell_choice.Buy, 1000))
+                self.new_promise(promise_sell(mean, self.today_time + datetime.timedelta(days=30), googl_info, "GOOGL", 1000))
             else:
-                self.new_promise(promise_buy(mean * 0.9, self.today_time + datetime.timedelta(days = 30), self.latest_stocks_info["GOOGL"], "GOOGL", 1000))
+                self.new_promise(promise_buy(mean * 0.9, self.today_time + datetime.timedelta(days = 30), googl_info, "GOOGL", 1000))
         return choices
 
     def end(self):
-        GOOGL_history_price = self.latest_stocks_info["GOOGL"].get_history_price(self.today_time)
-        x = GOOGL_history_price.loc[GOOGL_history_price.index.get_level_values("date") > (self.today_time - datetime.timedelta(days=30)).date()].close.values
-        records = self.__investments_info__.get_records()
-        with open("records.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(["time", "price", "choice", "money_value", "number", "delta_money_value", "delta_number"])
-            for record in records:
-                writer.writerow([record["time"], record["price"], int(record["choice"]), record["money_value"], record["number"], record["delta_money_value"], record["delta_number"]])
+        x = self.latest_stocks_info["GOOGL"].get_history_close_prices(self.today_time, datetime.timedelta(days=30))
+        investments = self.__investments_info__.get_records()
+        records = pd.DataFrame(investments, columns=["time", "price", "choice", "money_value", "number", "delta_money_value", "delta_number"])
+        # str() of each time as csv.writer wrote it, with microseconds and UTC offset when the time has them.
+        records["time"] = [str(time) for time in investments["time"]]
+        records["choice"] = records["choice"].astype(int)
+        records.to_csv("records.csv", index=False, lineterminator="\r\n")
         print("Money change: {}, asset value change: {}".format(self.changed_money, self.changed_money + self.hold_stock_number["GOOGL"] * x[-1]))
@@ -1,9 +1,71 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import warnings
+import functools
+from numba import njit, prange, types
 
 
 
+# Explicit signatures compile the kernels eagerly at import (or load them from the
+# on-disk cache), so the first rs_analysis call does not stall on JIT compilation.
+# Read-only arrays are included since pandas may hand out read-only .values.
+# nogil lets strategies run the kernels from several threads at once.
+_float64_arrays = (types.Array(types.float64, 1, "C"), types.Array(types.float64, 1, "C", readonly=True))
+
+
+@njit([types.UniTuple(types.float64, 2)(arr, types.int64, types.int64) for arr in _float64_arrays], nogil=True, fastmath={"reassoc", "contract"}, cache=True)
+def _rs_range_and_std(x, start, n):
+    # Range of cumulative deviation and standard deviation of x[start:start + n]
+    # without materializing the deviation series.
+    mean = 0.0
+    for j in range(start, start + n):
+        mean += x[j]
+    mean /= n
+    z = 0.0
+    z_min = np.inf
+    z_max = -np.inf
+    s2 = 0.0
+    for j in range(start, start + n):
+        d = x[j] - mean
+        z += d
+        z_min = min(z_min, z)
+        z_max = max(z_max, z)
+        s2 += d * d
+    return z_max - z_min, np.sqrt(s2 / n)
+
+
+@njit([types.float64[:](arr, types.int64) for arr in _float64_arrays], parallel=True, nogil=True, fastmath={"reassoc", "contract"}, cache=True)
+def _rs_kernel(x, chunk_size):
+    # R/S of every full chunk of chunk_size, chunks are independent so they run in parallel.
+    num_chunks = (len(x) - 1) // chunk_size
+    rs = np.empty(num_chunks)
+    for i in prange(num_chunks):
+        r, s = _rs_range_and_std(x, i * chunk_size, chunk_size)
+        if np.isnan(s):
+            rs[i] = np.nan
+        elif np.abs(s) < 0.0001:
+            rs[i] = 1.0
+        else:
+            rs[i] = r / s
+    return rs
+
+
+@functools.lru_cache(maxsize=32)
+def _rs_design(N, min_chunk_size):
+    # The dyadic chunk sizes only depend on N and min_chunk_size, so they and the
+    # pseudo-inverse of the log(n) least-squares design matrix are built once.
+    if N <= min_chunk_size:
+        num_sizes = 0
+    else:
+        num_sizes = int(np.ceil(np.log2(N / min_chunk_size)))
+    chunk_sizes = min_chunk_size * (1 << np.arange(num_sizes))
+    log_n = np.log(chunk_sizes)
+    pinv = np.linalg.pinv(np.vstack((log_n, np.ones(len(log_n)))).T)
+    for arr in (chunk_sizes, log_n, pinv):
+        arr.flags.writeable = False
+    return chunk_sizes, log_n, pinv
+
+
 class math_util:
     @staticmethod
     @staticmethod
@@ -14,37 +76,20 @@ class math_util:
     def rs_analysis(x, min_chunk_size):
         if min_chunk_size < 2:
             min_chunk_size = 2
+        x = np.ascontiguousarray(x, dtype=np.float64)
         N = len(x)
-        rs_series = []
-        n_series = []
-        # 1. The series is divided into chunks of chunk_size_list size
-        chunk_size = min_chunk_size
-        while chunk_size < len(x):
-            rs_n_list = []
-            for start_index in range(0, len(x) - chunk_size, chunk_size):
-                x_n = x[start_index : start_index + chunk_size]
-                z_t = np.cumsum(x_n - np.mean(x_n))
-                r_n = np.max(z_t) - np.min(z_t)
-                s_n = np.nanstd(x_n)
-                rs_n = 1.0
-                if not np.abs(s_n) < 0.0001:
-                    rs_n = np.divide(r_n, s_n)
-                rs_n_list.append(rs_n)
-            rs_series.append(np.nanmean(rs_n_list))
-            n_series.append(chunk_size)
-
-            # We increment index by 1 per sampling.
-            chunk_size = 2 * chunk_size
-
-        # plt.plot(np.log(n_series), np.log(rs_series))
-        # plt.plot(np.arange(np.log(n_series)[0], np.log(n_series)[-1]), 0.5 * np.arange(np.log(n_series)[0], np.log(n_series)[-1]))
+        # 1. The series is divided into chunks of every dyadic chunk size below N.
+        chunk_sizes, log_n, pinv = _rs_design(N, min_chunk_size)
+        rs_series = np.empty(len(chunk_sizes))
+        for i, chunk_size in enumerate(chunk_sizes):
+            # 2. R/S of every full chunk is computed in native code.
+            rs_series[i] = np.nanmean(_rs_kernel(x, chunk_size))
+
+        # plt.plot(log_n, np.log(rs_series))
+        # plt.plot(np.arange(log_n[0], log_n[-1]), 0.5 * np.arange(log_n[0], log_n[-1]))
         # 3. calculate the Hurst exponent.
-        H, c = np.linalg.lstsq(
-            a=np.vstack((np.log(n_series), np.ones(len(n_series)))).T,
-            b=np.log(rs_series),
-            rcond=None
-        )[0]
-        # plt.plot(np.arange(np.log(n_series)[0], np.log(n_series)[-1]), H * np.arange(np.log(n_series)[0], np.log(n_series)[-1]) + c)
+        H, c = pinv @ np.log(rs_series)
+        # plt.plot(np.arange(log_n[0], log_n[-1]), H * np.arange(log_n[0], log_n[-1]) + c)
         # plt.show()
 
         return H, c
@@ -53,11 +98,12 @@ class math_util:
     def calc_trending_rate_with_polyfit(x, n=3):
         x_i = np.linspace(0, 1, len(x))
         z = np.polyfit(x_i, x, n)
-        p = np.poly1d(z)
-        p_2 = np.polyder(p, 1)
-        _ = plt.plot(x_i, x, '-', x_i, p(x_i), "--")
+        # p'(1) is the sum of the derivative coefficients.
+        p_2 = np.sum(z[:-1] * np.arange(n, 0, -1))
+        # _ = plt.plot(x_i, x, '-', x_i, np.polyval(z, x_i), "--")
         # plt.show()
-        return p_2(1) / list(x)[-1]
+        last = x.iloc[-1] if hasattr(x, "iloc") else x[-1]
+        return p_2 / last
 
     @staticmethod
     def calc_trending_rate_with_lstd(x):
@@ -67,16 +113,21 @@ class math_util:
             b=x,
             rcond=None
         )[0]
-        return k / list(x)[-1]
+        last = x.iloc[-1] if hasattr(x, "iloc") else x[-1]
+        return k / last
         
     @staticmethod
     def calc_trending_rate_with_simple_method(x):
         # x_i = np.linspace(0, 1, len(x))
-        k = (list(x)[-1] - list(x)[0])
-        # p = np.poly1d([k, list(x)[0]])
+        if hasattr(x, "iloc"):
+            first, last = x.iloc[0], x.iloc[-1]
+        else:
+            first, last = x[0], x[-1]
+        k = (last - first)
+        # p = np.poly1d([k, first])
         # _ = plt.plot(x_i, x, '-', x_i, p(x_i), "--")
         # plt.show()
-        return k / list(x)[-1]
+        return k / last
 
 
 
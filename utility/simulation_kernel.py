@@ -1,22 +1,37 @@
 from .strategy import strategy_base, MyStrategy
 from abc import ABC, abstractmethod
-from .stock_util import stock_info
+from .stock_util import stock_info, update_stock_infos
 from .economic_util import economic_info_base
 import datetime
+import pandas as pd
 
 
 
 class simulation_kernel():
+    __loaded_stocks_info__ = {} # dict[tuple[str, datetime.timedelta, bool], stock_info], stock infos loaded by the running kernels of this process
+
     def __init__(self, start_time: datetime.datetime, end_time: datetime.datetime, interval: datetime.timedelta):
         self.__strategies__ = [] # list[strategy_base]
         self.__stocks_info__ = {} # dict[str, stock_info]
         self.__economics_info__ = {} # dict[str, stock_info]
+        self.__strategy_stock_map__ = [] # list[tuple[strategy_base, dict[str, stock_info]]]
 
 
         self.__start_time__ = start_time
         self.__end_time__ = end_time
         self.__current_time__ = self.__start_time__
         self.__interval__ = interval
+        # every tick of the run, generated in one go instead of by repeated timedelta addition.
+        if start_time.tzinfo is None:
+            self.__ticks__ = pd.date_range(start_time, end_time, freq=interval).to_pydatetime()
+        else:
+            # pd.date_range steps aware times in absolute time, datetime + timedelta keeps the
+            # wall clock across DST changes, so aware runs keep adding timedeltas.
+            self.__ticks__ = []
+            current_time = start_time
+            while current_time <= end_time:
+                self.__ticks__.append(current_time)
+                current_time += interval
 
     def add_strategy(self, strategy: strategy_base):
         self.__strategies__.append(strategy)
@@ -27,13 +42,41 @@ class simulation_kernel():
 
     def initialize(self):
         self.__collect_strategies_stock_names__()
+        # stock infos handed to each strategy are fixed for the whole run, build them once.
+        self.__strategy_stock_map__ = [
+            (strategy, {stock_name: self.__stocks_info__[stock_name] for stock_name in strategy.get_stock_names()})
+            for strategy in self.__strategies__
+        ]
 
     def __collect_strategies_stock_names__(self):
+        # stock infos loaded by an earlier initialize, or by another kernel of this process that has not ended,
+        # already cover this kernel's time range.
+        new_stocks_info = []
         for strategy in self.__strategies__:
             stock_names = strategy.get_stock_names()
             for stock_name in stock_names:
-                self.__stocks_info__[stock_name] = stock_info(stock_name, self.__start_time__, self.__end_time__, self.__interval__)
-                self.__stocks_info__[stock_name].update() # retrive data from web.
+                if stock_name in self.__stocks_info__:
+                    continue
+                loaded = simulation_kernel.__loaded_stocks_info__.get(self.__loaded_stocks_info_key__(stock_name))
+                if loaded is not None and loaded.get_loaded_until() >= self.__end_time__:
+                    self.__stocks_info__[stock_name] = loaded
+                else:
+                    self.__stocks_info__[stock_name] = stock_info(stock_name, self.__start_time__, self.__end_time__, self.__interval__)
+                    new_stocks_info.append(self.__stocks_info__[stock_name])
+        update_stock_infos(new_stocks_info) # retrive data from web.
+        # registered only once loaded, keeping whichever info of a stock reaches further.
+        for info in new_stocks_info:
+            loaded_until = info.get_loaded_until()
+            if loaded_until is None:
+                continue
+            key = self.__loaded_stocks_info_key__(info.ticket_name)
+            loaded = simulation_kernel.__loaded_stocks_info__.get(key)
+            if loaded is None or loaded.get_loaded_until() <= loaded_until:
+                simulation_kernel.__loaded_stocks_info__[key] = info
+
+    def __loaded_stocks_info_key__(self, stock_name: str):
+        # naive and timezone-aware times can't be compared, so kernels of either kind keep apart.
+        return (stock_name, self.__interval__, self.__end_time__.tzinfo is None)
 
     def update_stock(self):
         pass
@@ -43,20 +86,21 @@ class simulation_kernel():
             self.__economics_info__[economic_name].update()
 
     def run(self):
-        while self.__current_time__ <= self.__end_time__:
+        for current_time in self.__ticks__:
+            self.__current_time__ = current_time
             self.update_stock()
             self.update_economic()
-            for strategy in self.__strategies__:
-                stock_infos = {}
-                for stock_name in strategy.get_stock_names():
-                    stock_infos[stock_name] = self.__stocks_info__[stock_name]
+            for strategy, stock_infos in self.__strategy_stock_map__:
                 strategy.tick(stock_infos, self.__economics_info__, self.__current_time__)
-            
-            self.__current_time__ += self.__interval__
 
     def end(self):
         for strategy in self.__strategies__:
             strategy.end()
+        # the run is over, stop sharing its stock infos so their histories can be freed.
+        for stock_name, info in self.__stocks_info__.items():
+            key = self.__loaded_stocks_info_key__(stock_name)
+            if simulation_kernel.__loaded_stocks_info__.get(key) is info:
+                del simulation_kernel.__loaded_stocks_info__[key]
 
 
 
@@ -1,27 +1,39 @@
 from yahooquery import Ticker
+import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+import numpy as np
 import datetime
-from enum import Enum
+from enum import IntEnum
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 
 
 
-class buy_or_sell_choice(Enum):
-    Buy = 0, "Buy"
-    Sell = 1, "Sell"
-    DoNothing = 2, "DoNothing"
-    
-    def __new__(cls, value, name):
-        member = object.__new__(cls)
-        member._value_ = value
-        member.fullname = name
-        return member
+class buy_or_sell_choice(IntEnum):
+    Buy = 0
+    Sell = 1
+    DoNothing = 2
+
+    @property
+    def fullname(self):
+        return self.name
+
+class stock_choice(NamedTuple):
+    # One decision of a strategy: trade number of ticket_name's stock as choice_type.
+    ticket_name: str
+    choice_type: buy_or_sell_choice
+    number: float
 
-    def __int__(self):
-        return self.value
+# One HTTP session for every Ticker of the process, so batches and later updates reuse its
+# keep-alive connections. urllib3's connection pool serves the concurrent batches.
+_shared_session = requests.Session()
+_shared_session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
 
 class stock(Ticker):
     def __init__(self, symbols, **kwargs):
+        kwargs.setdefault("session", _shared_session)
         super(stock, self).__init__(symbols, **kwargs)
         self.symbols = symbols
 
@@ -32,34 +44,126 @@ class stock(Ticker):
         pass
 
 class stock_info():
+    __slots__ = ("ticket_name", "start_time", "end_time", "interval", "interval_str", "__stock__", "fetch_time",
+                 "history_price_data", "empty_price_data", "history_days", "close_prices", "history_day_rows")
+
     def __init__(self, ticket_name, start_time: datetime.datetime, end_time: datetime.datetime, interval: datetime.timedelta):
         self.ticket_name = ticket_name
         self.start_time = start_time
         self.end_time = end_time
         self.interval = interval
-        self.stock = stock(ticket_name)
+        self.interval_str = "1d" # yahooquery interval string
+        if self.interval.days > 0:
+            self.interval_str = "{}d".format(self.interval.days)
+        elif self.interval.seconds > 0:
+            self.interval_str = "{}h".format(self.interval.seconds // 60 // 60)
+        self.__stock__ = None
+        self.fetch_time = None # when the history was loaded, None until then
         self.history_price_data = pd.DataFrame()
+        self.empty_price_data = self.history_price_data
+        self.history_days = np.empty(0, dtype=np.int64)
+        self.close_prices = np.empty(0)
+        self.history_day_rows = {} # dict[int, int], day ordinal -> first row of that day
+
+    @property
+    def stock(self) -> stock:
+        # Only built when this info downloads on its own, batched updates use their own Ticker.
+        if self.__stock__ is None:
+            self.__stock__ = stock(self.ticket_name)
+        return self.__stock__
 
     def update(self):
-        interval = "1d"
-        if self.interval.days > 0:
-            interval = "{}d".format(self.interval.days)
-        elif self.interval.seconds > 0:
-            interval = "{}h".format(self.interval.seconds // 60 // 60)
-        self.history_price_data = self.stock.history("100y", interval, None, self.end_time)
+        self.set_history_price_data(self.stock.history("100y", self.interval_str, None, self.end_time))
+
+    def set_history_price_data(self, history_price_data: pd.DataFrame):
+        # Day ordinal of every row, so date lookups are binary searches instead of index scans.
+        # yahooquery mixes date and datetime values in the "date" level, toordinal() handles both.
+        dates = history_price_data.index.get_level_values("date")
+        history_days = np.fromiter((date.toordinal() for date in dates), dtype=np.int64, count=len(dates))
+        if np.any(history_days[1:] < history_days[:-1]):
+            order = np.argsort(history_days, kind="stable")
+            history_price_data = history_price_data.iloc[order]
+            history_days = history_days[order]
+        self.history_price_data = history_price_data
+        # Shared result of get_today_price on days without data.
+        self.empty_price_data = history_price_data.iloc[0:0]
+        self.history_days = history_days
+        self.close_prices = history_price_data["close"].to_numpy()
+        # strategies get views of it, read-only so they can't write into the shared history.
+        self.close_prices.flags.writeable = False
+        # Filled backwards so every day maps to its first row.
+        self.history_day_rows = dict(zip(history_days[::-1].tolist(), range(len(history_days) - 1, -1, -1)))
+        # in end_time's timezone, naive or not, so the two can be compared.
+        self.fetch_time = datetime.datetime.now(self.end_time.tzinfo)
+
+    def get_loaded_until(self):
+        # The history is complete up to end_time, or only up to the fetch when end_time was still ahead then.
+        if self.fetch_time is None:
+            return None
+        return min(self.end_time, self.fetch_time)
+
+    def get_today_row(self, current_time: datetime.datetime):
+        # Position of the first row of current_time's day, or None when there is no data that day.
+        return self.history_day_rows.get(current_time.toordinal())
 
     def get_today_price(self, current_time: datetime.datetime) -> pd.DataFrame:
-        return self.history_price_data.loc[self.history_price_data.index.get_level_values("date") == current_time.date()]
+        day = current_time.toordinal()
+        start = self.history_day_rows.get(day)
+        if start is None:
+            return self.empty_price_data
+        end = np.searchsorted(self.history_days, day, "right")
+        return self.history_price_data.iloc[start:end]
 
     def get_history_price(self, current_time: datetime.datetime):
-        return self.history_price_data.loc[self.history_price_data.index.get_level_values("date") <= current_time.date()]
+        return self.history_price_data.iloc[:np.searchsorted(self.history_days, current_time.toordinal(), "right")]
+
+    def get_history_close_prices(self, current_time: datetime.datetime, time_range: datetime.timedelta) -> np.ndarray:
+        # Close prices of the days in (current_time - time_range, current_time], a view of close_prices.
+        day = current_time.toordinal()
+        if time_range.seconds == 0 and time_range.microseconds == 0:
+            # whole-day ranges are plain ordinal arithmetic, no datetime is built.
+            start_day = day - time_range.days
+        else:
+            start_day = (current_time - time_range).toordinal()
+        start = np.searchsorted(self.history_days, start_day, "right")
+        end = np.searchsorted(self.history_days, day, "right")
+        return self.close_prices[start:end]
+
+def _update_stock_info_batch(stock_infos: list[stock_info]):
+    ticker = stock([info.ticket_name for info in stock_infos])
+    history = ticker.history("100y", stock_infos[0].interval_str, None, max(info.end_time for info in stock_infos))
+    symbols = set()
+    if isinstance(history, pd.DataFrame) and "symbol" in history.index.names:
+        symbols = set(history.index.get_level_values("symbol"))
+    for info in stock_infos:
+        if info.ticket_name in symbols:
+            info.set_history_price_data(history.xs(info.ticket_name, level="symbol", drop_level=False))
+        else:
+            # yahooquery returns a dict when any symbol fails, retry those on their own.
+            info.update()
+
+def update_stock_infos(stock_infos: list[stock_info], batch_size: int = 10, max_workers: int = 8):
+    # yahooquery fetches the history of all symbols of one Ticker in a single request,
+    # so stock infos sharing an interval are fetched in batches of batch_size symbols
+    # and the batches are downloaded concurrently.
+    groups = {}
+    for info in stock_infos:
+        groups.setdefault(info.interval_str, []).append(info)
+    batches = [group[i: i + batch_size] for group in groups.values() for i in range(0, len(group), batch_size)]
+    if len(batches) == 0:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        list(executor.map(_update_stock_info_batch, batches))
 
 def extract_close_price(stock_info: stock_info, date_time: datetime.datetime):
-    if len(stock_info.get_today_price(date_time).close.values) > 0:
-        return stock_info.get_today_price(date_time).close.values[0]
+    row = stock_info.get_today_row(date_time)
+    if row is not None:
+        return stock_info.close_prices[row]
     return None
 
 class promise_base(ABC):
+    __slots__ = ("promise_price", "promise_datetime", "stock", "ticket_name", "number")
+
     def __init__(self, promise_price: float, promise_datetime: datetime.datetime, stock: stock_info, ticket_name: str, number: float):
         self.promise_price = promise_price
         self.promise_datetime = promise_datetime
@@ -72,6 +176,8 @@ class promise_base(ABC):
         return False, buy_or_sell_choice.DoNothing
 
 class promise_buy(promise_base):
+    __slots__ = ()
+
     def __init__(self, promise_price: float, promise_datetime: datetime.datetime, stock: stock_info, ticket_name: str, number: float):
         super(promise_buy, self).__init__(promise_price, promise_datetime, stock, ticket_name, number)
     
@@ -79,13 +185,15 @@ class promise_buy(promise_base):
         if current_datetime > self.promise_datetime:
             return True, buy_or_sell_choice.Buy
         today_price = extract_close_price(self.stock, current_datetime)
-        if today_price == None:
+        if today_price is None:
             return False, buy_or_sell_choice.DoNothing
         elif today_price <= self.promise_price:
             return True, buy_or_sell_choice.Buy
         return False, buy_or_sell_choice.DoNothing
 
 class promise_sell(promise_base):
+    __slots__ = ()
+
     def __init__(self, promise_price: float, promise_datetime: datetime.datetime, stock: stock_info, ticket_name: str, number: float):
         super(promise_sell, self).__init__(promise_price, promise_datetime, stock, ticket_name, number)
     
@@ -93,7 +201,7 @@ class promise_sell(promise_base):
         if current_datetime > self.promise_datetime:
             return True, buy_or_sell_choice.Sell
         today_price = extract_close_price(self.stock, current_datetime)
-        if today_price == None:
+        if today_price is None:
             return False, buy_or_sell_choice.DoNothing
         elif today_price >= self.promise_price:
             return True, buy_or_sell_choice.Sell
@@ -1,16 +1,29 @@
 import datetime
 from abc import ABC, abstractmethod
-from .stock_util import stock_info, buy_or_sell_choice, promise_buy, promise_sell, extract_close_price
+from .stock_util import stock_info, buy_or_sell_choice, stock_choice, promise_buy, promise_sell, extract_close_price
 from .economic_util import economic_info_base
 from .math_util import math_util
-import csv
+import pandas as pd
 import numpy as np
 
 
 
-class investment_record(ABC):
-    def __init__(self):
-        self.records = []
+class investment_record():
+    # One array per record field (structure of arrays), grown by doubling.
+    __record_dtypes__ = {
+        "time": object, # datetime objects, datetime64 would drop their timezone
+        "price": np.float64,
+        "stock_info": object,
+        "choice": np.int8,
+        "number": np.float64,
+        "money_value": np.float64,
+        "delta_money_value": np.float64,
+        "delta_number": np.float64
+    }
+
+    def __init__(self, capacity: int = 64):
+        self.records = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.__record_dtypes__.items()}
+        self.records_size = 0
 
     def handle_choice(self, date_time: datetime.datetime, stock_info: stock_info, choice: buy_or_sell_choice, number: float, total_money: float, total_number: float) -> tuple[float, float]:
         if choice == buy_or_sell_choice.DoNothing:
@@ -35,7 +48,7 @@ class investment_record(ABC):
             delta_number = -number
         if number == 0:
             return 0, 0
-        self.records.append({
+        self.__append_record__({
             "time": date_time,
             "price": price,
             "stock_info": stock_info,
@@ -48,8 +61,21 @@ class investment_record(ABC):
         
         return delta_asset_value, delta_number
 
-    def get_records(self):
-        return self.records.copy()
+    def __append_record__(self, record):
+        if self.records_size == len(self.records["time"]):
+            for name, column in self.records.items():
+                self.records[name] = np.concatenate((column, np.empty_like(column)))
+        for name, value in record.items():
+            self.records[name][self.records_size] = value
+        self.records_size += 1
+
+    def get_records(self) -> dict[str, np.ndarray]:
+        # read-only views, rows already recorded never change and growing allocates new arrays.
+        records = {}
+        for name, column in self.records.items():
+            records[name] = column[:self.records_size]
+            records[name].flags.writeable = False
+        return records
 
     def get_statistics(self):
         pass
@@ -90,32 +116,32 @@ class strategy_base(ABC):
             self.handle_choice(choice)
 
     def handle_promises(self):
+        # fulfilled promises are dropped in the same pass, kept ones stay in order.
         choice_list = []
-        promised_list = []
+        kept_promises = []
         for promise in self.promises:
             do_it, choice = promise.do_promise_or_not(self.today_time)
             if do_it:
-                promised_list.append(promise)
-                choice_list.append({promise.ticket_name: (choice, promise.number)})
-        for promised in promised_list:
-            self.promises.remove(promised)
+                choice_list.append(stock_choice(promise.ticket_name, choice, promise.number))
+            else:
+                kept_promises.append(promise)
+        self.promises = kept_promises
         return choice_list
 
-    def handle_choice(self, choice):
-        for ticket in choice.keys():
-            changed_value, changed_number = self.__investments_info__.handle_choice(
-                self.today_time,
-                self.latest_stocks_info[ticket],
-                choice[ticket][0],
-                choice[ticket][1],
-                self.initial_money + self.changed_money,
-                self.hold_stock_number[ticket]
-            )
-            self.changed_money += changed_value
-            if choice[ticket][0] != buy_or_sell_choice.DoNothing:
-                if ticket not in self.hold_stock_number.keys():
-                    self.hold_stock_number[ticket] = 0
-                self.hold_stock_number[ticket] += changed_number
+    def handle_choice(self, choice: stock_choice):
+        ticket, choice_type, number = choice
+        if choice_type == buy_or_sell_choice.DoNothing:
+            return
+        changed_value, changed_number = self.__investments_info__.handle_choice(
+            self.today_time,
+            self.latest_stocks_info[ticket],
+            choice_type,
+            number,
+            self.initial_money + self.changed_money,
+            self.hold_stock_number[ticket]
+        )
+        self.changed_money += changed_value
+        self.hold_stock_number[ticket] += changed_number
 
     def new_promise(self, promise):
         self.promises.append(promise)
@@ -125,8 +151,8 @@ class strategy_base(ABC):
         pass
 
     @abstractmethod
-    def make_choice(self) -> list[dict[str, tuple[buy_or_sell_choice, float]]]:
-        return {}
+    def make_choice(self) -> list[stock_choice]:
+        pass
 
 class MyStrategy(strategy_base):
     def __init__(self):
@@ -140,45 +166,45 @@ class MyStrategy(strategy_base):
         self.bet_date = datetime.datetime.now()
         self.promises = [] # list[promise_base]
 
-    def make_choice(self) -> list[dict[str, tuple[buy_or_sell_choice, float]]]:
-        today_price = extract_close_price(self.latest_stocks_info["GOOGL"], self.today_time)
-        if today_price == None:
+    def make_choice(self) -> list[stock_choice]:
+        googl_info = self.latest_stocks_info["GOOGL"]
+        today_price = extract_close_price(googl_info, self.today_time)
+        if today_price is None:
             return []
         choices = []
-        GOOGL_history_price = self.latest_stocks_info["GOOGL"].get_history_price(self.today_time)
-        x = GOOGL_history_price.loc[GOOGL_history_price.index.get_level_values("date") > (self.today_time - datetime.timedelta(days=30)).date()].close.values
+        x = googl_info.get_history_close_prices(self.today_time, datetime.timedelta(days=30))
         if len(x) < 2:
             return choices
         hurst_exponent, c = math_util.rs_analysis(x, 2)
-        mean = np.average(list(x))
+        mean = x.mean()
         if hurst_exponent > 0.6:
-            trending_rate = (list(x)[-1] - list(x)[0]) / list(x)[0]
+            first, last = x[0], x[-1]
+            trending_rate = (last - first) / first
             if trending_rate > 0 and not self.has_bet:
                 # self.has_bet = True
                 self.bet_price = x[-1]
                 self.bet_target_price = x[-1] * trending_rate
                 self.bet_date = self.today_time
-                choices.append({"GOOGL": (buy_or_sell_choice.Buy, (100 + self.hold_stock_number["GOOGL"] * 2))})
+                choices.append(stock_choice("GOOGL", buy_or_sell_choice.Buy, (100 + self.hold_stock_number["GOOGL"] * 2)))
                 if self.initial_money + self.changed_money > 0:
-                    self.new_promise(promise_sell(mean * 1.1, self.today_time + datetime.timedelta(days=60), self.latest_stocks_info["GOOGL"], "GOOGL", 100 + self.hold_stock_number["GOOGL"] * 2))
-                # choice = {"GOOGL": (buy_or_sell_choice.Buy, (self.initial_money + self.changed_money) / x[-1])}
+                    self.new_promise(promise_sell(mean * 1.1, self.today_time + datetime.timedelta(days=60), googl_info, "GOOGL", 100 + self.hold_stock_number["GOOGL"] * 2))
+                # choice = stock_choice("GOOGL", buy_or_sell_choice.Buy, (self.initial_money + self.changed_money) / x[-1])
         elif hurst_exponent < 0.4:
             if today_price < mean * 0.9:
-                choices.append({"GOOGL": (buy_or_sell_choice.Buy, 1000)})
-                self.new_promise(promise_sell(mean, self.today_time + datetime.timedelta(days=30), self.latest_stocks_info["GOOGL"], "GOOGL", 1000))
+                choices.append(stock_choice("GOOGL", buy_or_sell_choice.Buy, 1000))
+                self.new_promise(promise_sell(mean, self.today_time + datetime.timedelta(days=30), googl_info, "GOOGL", 1000))
             else:
-                self.new_promise(promise_buy(mean * 0.9, self.today_time + datetime.timedelta(days = 30), self.latest_stocks_info["GOOGL"], "GOOGL", 1000))
+                self.new_promise(promise_buy(mean * 0.9, self.today_time + datetime.timedelta(days = 30), googl_info, "GOOGL", 1000))
         return choices
 
     def end(self):
-        GOOGL_history_price = self.latest_stocks_info["GOOGL"].get_history_price(self.today_time)
-        x = GOOGL_history_price.loc[GOOGL_history_price.index.get_level_values("date") > (self.today_time - datetime.timedelta(days=30)).date()].close.values
-        records = self.__investments_info__.get_records()
-        with open("records.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(["time", "price", "choice", "money_value", "number", "delta_money_value", "delta_number"])
-            for record in records:
-                writer.writerow([record["time"], record["price"], int(record["choice"]), record["money_value"], record["number"], record["delta_money_value"], record["delta_number"]])
+        x = self.latest_stocks_info["GOOGL"].get_history_close_prices(self.today_time, datetime.timedelta(days=30))
+        investments = self.__investments_info__.get_records()
+        records = pd.DataFrame(investments, columns=["time", "price", "choice", "money_value", "number", "delta_money_value", "delta_number"])
+        # str() of each time as csv.writer wrote it, with microseconds and UTC offset when the time has them.
+        records["time"] = [str(time) for time in investments["time"]]
+        records["choice"] = records["choice"].astype(int)
+        records.to_csv("records.csv", index=False, lineterminator="\r\n")
         print("Money change: {}, asset value change: {}".format(self.changed_money, self.changed_money + self.hold_stock_number["GOOGL"] * x[-1]))
 
 